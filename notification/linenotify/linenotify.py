@@ -1,5 +1,5 @@
 import asyncio
-from datetime import datetime
+import time
 
 import aiohttp
 from cachetools import TTLCache
@@ -8,6 +8,14 @@ from src import EEW, BaseNotificationClient, Settings, Config, Logger
 
 LINE_NOTIFY_API = "https://notify-api.line.me/api/notify"
 MAP_URL = Settings.get("showmapurl")
+INTENSITY_MSG_HEADER = "\n🚨第{serial}報🚨\n⚠️以下僅供參考⚠️\n預估震度|抵達時間:"
+INTENSITY_MSG_FOOTER = "\n⚠️請以氣象署為準⚠️"
+EEW_MSG_TEMPLATE = (
+    "\n{time},\n發生規模 {mag} 地震,\n編號{id},"
+    "\n震央位在{location},"
+    "\n震源深度{depth} 公里,\n最大震度{max_intensity}"
+    " \n(發報單位: {provider})"
+)
 
 
 class LineNotifyClient(BaseNotificationClient):
@@ -30,24 +38,35 @@ class LineNotifyClient(BaseNotificationClient):
         self.config = config
         self._notify_token = notify_token
         self._custom_set = Settings.get("customization")
+        self._customize = self._custom_set.get("enable")
         self._intensity_alerts = TTLCache(maxsize=20, ttl=180)
+        # 同一個 (id, serial) 的結果不會改變 保留最後一筆即可
+        self._intensity_cache: tuple = (None, None)
+        self._session: aiohttp.ClientSession = None
 
     def get_eew_message(self, eew: EEW):
         #取得EEW訊息並排版
         eq = eew.earthquake
-        time_str = eq.time.strftime("%m月%d日 %H:%M:%S")
-        content = (
-            f"\n{time_str},\n發生規模 {eq.mag} 地震,\n編號{eew.id},"
-            f"\n震央位在{eq.location.display_name or eq.location},"
-            f"\n震源深度{eq.depth} 公里,\n最大震度{eq.max_intensity.display}"
+        t = eq.time
+        # 固定格式直接用 f-string 排版 比 strftime 快
+        time_str = f"{t.month:02d}月{t.day:02d}日 {t.hour:02d}:{t.minute:02d}:{t.second:02d}"
+        return EEW_MSG_TEMPLATE.format(
+            time=time_str,
+            mag=eq.mag,
+            id=eew.id,
+            location=eq.location.display_name or eq.location,
+            depth=eq.depth,
+            max_intensity=eq.max_intensity.display,
+            provider=eew.provider.display_name
         )
-        provider = f"\n(發報單位: {eew.provider.display_name})"
-        _message = f"{content} {provider}"
-        return _message
 
     async def get_region_intensity(self, eew: EEW):
         #取得各地震度和抵達時間
-        customize = self._custom_set.get("enable")
+        cache_key = (eew.id, eew.serial)
+        if self._intensity_cache[0] == cache_key:
+            return self._intensity_cache[1]
+
+        customize = self._customize
         eq = eew.earthquake
         intensity_dict: dict[tuple[str, str], tuple[str,
                                                     int]] = self._intensity_alerts.get(eew.id) or {}
@@ -65,8 +84,11 @@ class LineNotifyClient(BaseNotificationClient):
                 for city, intensity in eq.city_max_intensity.items():
                     if intensity.intensity.value > 0:
                         key = (city, intensity.region.name)
-                        # 更新震度不更新抵達時間
-                        intensity_dict[key] = (intensity.intensity.display, intensity_dict[key][1])
+                        # 更新震度不更新抵達時間 只更新第一報已存在的地區
+                        old = intensity_dict.get(key)
+                        if old is None:
+                            continue
+                        intensity_dict[key] = (intensity.intensity.display, old[1])
 
         else:
             if intensity_dict == {}:
@@ -84,36 +106,39 @@ class LineNotifyClient(BaseNotificationClient):
                     for intensity in intensity_list:
                         if intensity.intensity.value >= 0:
                             key = (city, intensity.region.name)
-                            intensity_dict[key] = (
-                                intensity.intensity.display, intensity_dict[key][1]
-                            )
+                            old = intensity_dict.get(key)
+                            if old is None:
+                                continue
+                            intensity_dict[key] = (intensity.intensity.display, old[1])
 
         self._intensity_alerts[eew.id] = intensity_dict
+        self._intensity_cache = (cache_key, intensity_dict)
         return intensity_dict
 
     async def _send_region_intensity(self, eew: EEW):
         #發送各地震度和抵達時間並排版
         eq = eew.earthquake
-        await eq._intensity_calculated.wait()
-        if eq._intensity_calculated.is_set():
-            region_intensity = await self.get_region_intensity(eew)
-            current_time = int(datetime.now().timestamp())
-            region_intensity_message = f"\n🚨第{eew.serial}報🚨\n⚠️以下僅供參考⚠️\n預估震度|抵達時間:"
-
-            for (city, region), (intensity, s_arrival_time) in region_intensity.items():
-                arrival_time = max(s_arrival_time - current_time, 0)
-                region_intensity_message += f"\n{city} {region}:{intensity}\n剩餘{arrival_time}秒抵達"
-
-            region_intensity_message += "\n⚠️請以氣象署為準⚠️"
-
-            _headers = {
-                "Content-Type": "application/x-www-form-urlencoded",
-                "Authorization": f"Bearer {self._notify_token}"
-            }
-            async with aiohttp.ClientSession(headers=_headers) as session:
-                await self._post_line_api(session, intensity_msg=region_intensity_message)
+        if not eq._intensity_calculated.is_set():
+            await eq._intensity_calculated.wait()
+
+        region_intensity = await self.get_region_intensity(eew)
+        current_time = int(time.time())
+        # 以 list 累積後一次 join 避免重複串接字串
+        parts = [INTENSITY_MSG_HEADER.format(serial=eew.serial)]
+        append = parts.append
+        for (city, region), (intensity, s_arrival_time) in region_intensity.items():
+            arrival_time = max(s_arrival_time - current_time, 0)
+            append(f"\n{city} {region}:{intensity}\n剩餘{arrival_time}秒抵達")
+
+        parts.append(INTENSITY_MSG_FOOTER)
+        region_intensity_message = "".join(parts)
+
+        _headers = {"Authorization": f"Bearer {self._notify_token}"}
+        await self._post_line_api(
+            self._session, headers=_headers, intensity_msg=region_intensity_message
+        )
 
-            asyncio.create_task(self._send_eew_img(eew))
+        asyncio.create_task(self._send_eew_img(eew))
 
     async def _send_eew_img(self, eew: EEW):
         #發送各地震度圖片
@@ -121,15 +146,31 @@ class LineNotifyClient(BaseNotificationClient):
         try:
             message = self.get_eew_message(eew)
             await eq._draw_task
+            upload_task = None
             if eq.map._drawn:
                 eew_id = eew.id
-                eq.map.upload(eew_id)
+                # 網址由檔名決定 上傳和發送訊息可同時進行
+                upload_task = asyncio.create_task(eq.map.upload(eew_id, self._session))
                 map_url = f"{MAP_URL}?fileName={eew_id}.html"
                 map_msg = f"\n⚠️圖片僅供參考⚠️\n{map_url}\n⚠️以氣象署為準⚠️"
                 message += map_msg
             __headers = {"Authorization": f"Bearer {self._notify_token}"}
-            async with aiohttp.ClientSession(headers=__headers) as session:
-                await self._post_line_api(session, msg=message)
+            if upload_task is not None:
+                upload_result, post_result = await asyncio.gather(
+                    upload_task,
+                    self._post_line_api(self._session, headers=__headers, msg=message),
+                    return_exceptions=True
+                )
+                if isinstance(upload_result, Exception):
+                    self.logger.opt(exception=upload_result).error(
+                        f"Failed to upload the map: {upload_result}"
+                    )
+                if isinstance(post_result, Exception):
+                    self.logger.opt(exception=post_result).error(
+                        f"Failed to send image alert to Line-Notify: {post_result}"
+                    )
+            else:
+                await self._post_line_api(self._session, headers=__headers, msg=message)
 
         except asyncio.CancelledError:
             self.logger.info(f"Map task canceled")
@@ -139,6 +180,7 @@ class LineNotifyClient(BaseNotificationClient):
     async def _post_line_api(
         self,
         session: aiohttp.ClientSession,
+        headers: dict = None,
         img=None,
         msg: str = None,
         intensity_msg: str = None
@@ -148,15 +190,16 @@ class LineNotifyClient(BaseNotificationClient):
             if img and not msg and not intensity_msg:
                 raise ValueError("Image provided without a message.")
 
-            form = aiohttp.FormData()
-            if msg:
-                form.add_field('message', msg)
-            elif intensity_msg:
-                form.add_field('message', intensity_msg)
-            if img:
+            # 純文字用 form-urlencoded 有圖片才組 multipart
+            if img is None:
+                data = {"message": msg or intensity_msg}
+            else:
+                form = aiohttp.FormData()
+                form.add_field('message', msg or intensity_msg)
                 form.add_field('imageFile', img)
+                data = form
 
-            async with session.post(url=LINE_NOTIFY_API, data=form) as response:
+            async with session.post(url=LINE_NOTIFY_API, data=data, headers=headers) as response:
                 if response.ok:
                     self.logger.info(f"Message sent to Line-Notify successfully")
 
@@ -179,8 +222,24 @@ class LineNotifyClient(BaseNotificationClient):
 
         Note: DO NOT do any blocking calls to run the otification client.
         """
+        connector = aiohttp.TCPConnector(
+            limit=20,
+            limit_per_host=8,
+            ttl_dns_cache=300,
+            keepalive_timeout=75,
+            enable_cleanup_closed=True
+        )
+        timeout = aiohttp.ClientTimeout(total=10, sock_connect=3, sock_read=8)
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
         self.logger.info("LINE Notify is ready")
 
+    async def close(self) -> None:
+        """
+        Close the notification client.
+        """
+        if self._session is not None:
+            await self._session.close()
+
     async def send_eew(self, eew: EEW):
         """
         If an new EEW is detected, this method will be called.
@@ -60,7 +60,7 @@ class Client:
         self._ws = None
         self.websocket_config = websocket_config
 
-        self.alerts = TTLCache(maxsize=float("inf"), ttl=60 * 60)  # 1hr
+        self.alerts = TTLCache(maxsize=128, ttl=60 * 60)  # 1hr
         self.sent_alerts = TTLCache(maxsize=20, ttl=120)
         eew_source: dict = config.get("eew_source")
         self.__eew_source = (
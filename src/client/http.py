@@ -63,7 +63,10 @@ class HTTPClient:
 
     async def test_api_latencies(self):
         """Test all API nodes latencies"""
-        latencies = [(node, await self._test_latency(f"{node}/eq/eew")) for node in self.API_NODES]
+        results = await asyncio.gather(
+            *(self._test_latency(f"{node}/eq/eew") for node in self.API_NODES)
+        )
+        latencies = list(zip(self.API_NODES, results))
         latencies.sort(key=lambda x: x[1])
         self.node_latencies = latencies
         return latencies
@@ -182,7 +185,8 @@ class HTTPClient:
 
     async def test_ws_latencies(self):
         """Test all websocket nodes latencies"""
-        latencies = [(node, await self._test_ws_latency(node)) for node in self.WS_NODES]
+        results = await asyncio.gather(*(self._test_ws_latency(node) for node in self.WS_NODES))
+        latencies = list(zip(self.WS_NODES, results))
         latencies.sort(key=lambda x: x[1])
         self.ws_node_latencies = latencies
         return latencies
@@ -1,6 +1,7 @@
-from typing import Any, Union
+import os
+from typing import Any
 
-import tomlkit
+import tomllib
 
 
 class Config:
@@ -9,8 +10,13 @@ class Config:
     """
 
     _path: str = "config.toml"
-    with open(_path, "r") as f:
-        _config: dict = tomlkit.parse(f.read())
+    with open(_path, "rb") as f:
+        _config: dict = tomllib.load(f)
+    _mtime: int = os.stat(_path).st_mtime_ns
+
+    # Bind the parsed dict's get directly so hot-path lookups skip the
+    # classmethod dispatch. Same signature: get(key, default=None).
+    get = _config.get
 
     @classmethod
     def _load_config(cls) -> dict:
@@ -24,30 +30,20 @@ class Config:
         :return: The configuration file.
         :rtype: dict
         """
-        with open(cls._path, "r") as f:
-            return tomlkit.parse(f.read())
-
-    @classmethod
-    def get(cls, key: str, default: Any = None) -> Union[str, Any]:
-        """
-        Get a key from the configuration file.
-
-        :param key: The key to get.
-        :type key: str
-        :param default: The default value if the key is not found.
-        :type default: Any, optional
-
-        :return: The value of the key.
-        :rtype: str, Any
-        """
-        return cls._config.get(key, default)
+        with open(cls._path, "rb") as f:
+            return tomllib.load(f)
 
     @classmethod
     def reload(cls) -> None:
         """
         Reload the configuration file.
         """
+        mtime = os.stat(cls._path).st_mtime_ns
+        if mtime == cls._mtime:
+            return
         cls._config = cls._load_config()
+        cls.get = cls._config.get
+        cls._mtime = mtime
 
     def __getitem__(self, key: str) -> Any:
         """
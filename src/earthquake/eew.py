@@ -45,6 +45,7 @@ class EarthquakeData:
         "_map",
         "_intensity_calculated",
         "_check_intensity",
+        "_threshold",
     )
 
     def __init__(
@@ -75,6 +76,13 @@ class EarthquakeData:
         self._time = time
         self._max_intensity = max_intensity
         self._custom_set = Settings.get("customization")
+        if self._custom_set.get("enable"):
+            try:
+                self._threshold = float(self._custom_set.get("threshold"))
+            except ValueError:
+                raise ValueError("Threshold is not a int.")
+        else:
+            self._threshold = None
         self._model = get_wave_model(depth)
         self._intensity_calculated = asyncio.Event()
         self._draw_task: asyncio.Future = None
@@ -219,15 +227,12 @@ class EarthquakeData:
         return self._expected_intensity
 
     def check_intensity(self):
-        threshold = self._custom_set.get("threshold")
-        try:
-            threshold = float(threshold)
-        except ValueError:
-            raise ValueError("Threshold is not a int.")
-        for city, intensities in self._city_max_intensity.items():
-            if any(intensity.intensity.value >= threshold for intensity in intensities):
-                return True
-        return False
+        threshold = self._threshold
+        return any(
+            intensity.intensity.value >= threshold
+            for intensities in self._city_max_intensity.values()
+            for intensity in intensities
+        )
 
     def draw_image(self):
         try:
@@ -242,6 +247,10 @@ class EarthquakeData:
             pass
 
     def draw_image_in_executor(self, loop: asyncio.AbstractEventLoop):
+        """
+        Draw the intensity map in a thread executor so the synchronous
+        folium rendering never blocks the event loop.
+        """
         if self._draw_task is None:
             self._draw_task = loop.run_in_executor(None, self.draw_image)
         return self._draw_task
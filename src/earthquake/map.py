@@ -1,9 +1,10 @@
 import io
+from collections import defaultdict
 from typing import TYPE_CHECKING
 
-import requests
+import aiohttp
+import pandas as pd
 import folium
-from folium import GeoJson
 
 if TYPE_CHECKING:
     from earthquake.eew import EarthquakeData
@@ -13,6 +14,44 @@ from .location import COUNTRY_DATA, TAIWAN_CENTER, TOWN_RANGE
 
 url = Settings.get("uploadurl")
 key = Settings.get("uploadkey")
+CRS = "EPSG:4326"
+# CRS 不會改變 載入時設定一次即可
+for _code in list(TOWN_RANGE):
+    TOWN_RANGE[_code] = TOWN_RANGE[_code].set_crs(CRS)
+COUNTRY_DATA = COUNTRY_DATA.set_crs(CRS)
+_COUNTRY_STYLE = {"color": "black", "weight": 0.65, "fillOpacity": 0}
+AUTOZOOM_HTML = """
+<style>
+    .marker-icon {
+        font-size: 48px;
+        color: red;
+
+        @media screen and (width > 992px) {
+            font-size: 24px;
+            color: red;
+        }
+    }
+
+    .float_image {
+        position: absolute;
+        z-index: 999999;
+        bottom: 25%;
+        left: 10%;
+        width: 10%;
+
+        @media screen and (width > 992px) {
+            position: absolute;
+            z-index: 999999;
+            bottom: 10%;
+            left: 25%;
+            width: 5%;
+        }
+    }
+</style>
+ <img class="float_image" alt="float_image"
+    src="https://raw.githubusercontent.com/kukuxx/EEW-linenotify/main/asset/map_legend.png">
+</img>
+"""
 INTENSITY_COLOR: dict[int, str] = {
     0: None,
     1: "#5Ed3CF",
@@ -25,6 +64,14 @@ INTENSITY_COLOR: dict[int, str] = {
     8: "#D95656",
     9: "#C32EEE",
 }
+# 預先建立各震度的樣式 避免每個區域都重新配置 closure 和 dict
+_STYLE_BY_INTENSITY = {
+    i: {"fillColor": color, "color": "black", "weight": 0.25, "fillOpacity": 1}
+    for i, color in INTENSITY_COLOR.items() if color
+}
+_STYLE_FUNC_BY_INTENSITY = {
+    i: (lambda feature, style=style: style) for i, style in _STYLE_BY_INTENSITY.items()
+}
 
 
 class Map:
@@ -32,7 +79,7 @@ class Map:
     Represents the map for earthquake.
     """
 
-    __slots__ = ("_eq", "_image", "_drawn")
+    __slots__ = ("_eq", "_image", "_drawn", "_error")
 
     def __init__(self, earthquake: "EarthquakeData"):
         """
@@ -44,6 +91,8 @@ class Map:
         self._image = None
         self._drawn: bool = False
         "Whether the map has been drawn"
+        self._error: Exception = None
+        "The error raised while rendering the map (if any)"
 
     @property
     def image(self) -> io.StringIO:
@@ -56,113 +105,75 @@ class Map:
         if self._eq._expected_intensity is None:
             raise RuntimeError("Intensity have not been calculated yet.")
 
-        try:
-            CRS = "EPSG:4326"
-            # 地圖初始化 設定中心為台灣中心
-            m = folium.Map(
-                location=[TAIWAN_CENTER.lat, TAIWAN_CENTER.lon],
-                zoom_start=7,
-                tiles=None,
-                # attr="⚠️圖片僅供參考,實際請以氣象署公布為準⚠️",
-                max_bounds=True,  # 限制地圖在初始範圍內
-                zoomControl=False,  # 禁用缩放控件
-                # min_zoom=7,                 # 設定最小縮放級別
-                # max_zoom=9                  # 設定最大縮放級別
-            )
-
-            # 設定地圖的顯示範圍
-            bounds = [[20.5, 118.5], [25.75, 123.5]]
-            m.fit_bounds(bounds)
-
-            # 停用地圖上的所有縮放和拖曳功能
-            m.options["scrollWheelZoom"] = False
-            m.options["doubleClickZoom"] = False
-            m.options["touchZoom"] = False
-            m.options["dragging"] = False
-
-            autozoom_html = """
-            <style>
-                .marker-icon {
-                    font-size: 48px;
-                    color: red;
-        
-                    @media screen and (width > 992px) {
-                        font-size: 24px;
-                        color: red;
-                    }
-                }
-        
-                .float_image {
-                    position: absolute;
-                    z-index: 999999;
-                    bottom: 25%;
-                    left: 10%;
-                    width: 10%;
-        
-                    @media screen and (width > 992px) {
-                        position: absolute;
-                        z-index: 999999;
-                        bottom: 10%;
-                        left: 25%;
-                        width: 5%;
-                    }
-                }
-            </style>
-             <img class="float_image" alt="float_image"
-                src="https://raw.githubusercontent.com/kukuxx/EEW-linenotify/main/asset/map_legend.png">
-            </img>
-            """
-
-            m.get_root().html.add_child(folium.Element(autozoom_html))
-
-            for code, region_gdf in TOWN_RANGE.items():
-                TOWN_RANGE[code] = region_gdf.set_crs(CRS)
-
-            # 繪製區域及其強度
-            for code, region_gdf in TOWN_RANGE.items():
-                if code in self._eq._expected_intensity:
-                    intensity = self._eq._expected_intensity[code].intensity.value
-                    if intensity > 0:
-                        # 繪製區域，並根據強度設定顏色
-                        folium.GeoJson(
-                            region_gdf,
-                            style_function=lambda feature, intensity=intensity: {
-                                "fillColor": INTENSITY_COLOR[intensity],
-                                "color": "black",
-                                "weight": 0.25,
-                                "fillOpacity": 1
-                            }
-                        ).add_to(m)
-
-            # 繪製國家邊界
+        self._error = None
+        self._drawn = False
+
+        # 地圖初始化 設定中心為台灣中心
+        m = folium.Map(
+            location=[TAIWAN_CENTER.lat, TAIWAN_CENTER.lon],
+            zoom_start=7,
+            tiles=None,
+            # attr="⚠️圖片僅供參考,實際請以氣象署公布為準⚠️",
+            max_bounds=True,  # 限制地圖在初始範圍內
+            zoomControl=False,  # 禁用缩放控件
+            # min_zoom=7,                 # 設定最小縮放級別
+            # max_zoom=9                  # 設定最大縮放級別
+        )
+
+        # 設定地圖的顯示範圍
+        bounds = [[20.5, 118.5], [25.75, 123.5]]
+        m.fit_bounds(bounds)
+
+        # 停用地圖上的所有縮放和拖曳功能
+        m.options["scrollWheelZoom"] = False
+        m.options["doubleClickZoom"] = False
+        m.options["touchZoom"] = False
+        m.options["dragging"] = False
+
+        m.get_root().html.add_child(folium.Element(AUTOZOOM_HTML))
+
+        # 依震度將區域分組 每個震度只建立一個圖層
+        groups: dict[int, list] = defaultdict(list)
+        expected_intensity = self._eq._expected_intensity
+        for code, region_gdf in TOWN_RANGE.items():
+            region_intensity = expected_intensity.get(code)
+            if region_intensity is None:
+                continue
+            intensity = region_intensity.intensity.value
+            if intensity > 0:
+                groups[intensity].append(region_gdf)
+
+        # 繪製區域，並根據強度設定顏色
+        for intensity, gdfs in groups.items():
             folium.GeoJson(
-                COUNTRY_DATA.set_crs(CRS),
-                style_function=lambda x: {
-                    "color": "black",
-                    "weight": 0.65,
-                    "fillOpacity": 0
-                }
-            ).add_to(m)
-
-            # 在震央位置新增標記 使用 HTML 和 CSS 建立帶有「X」符號的標記
-            folium.Marker(
-                location=[self._eq.lat, self._eq.lon],
-                popup="震央",
-                icon=folium.DivIcon(html='<div class="marker-icon";>&#10006;&#xfe0e;</div>')
+                pd.concat(gdfs),
+                style_function=_STYLE_FUNC_BY_INTENSITY[intensity]
             ).add_to(m)
 
-            _map = io.StringIO()
-            html = m.get_root().render()
-            _map.write(html)
-            _map.seek(0)
-            self._image = _map
+        # 繪製國家邊界
+        folium.GeoJson(COUNTRY_DATA, style_function=lambda x: _COUNTRY_STYLE).add_to(m)
 
-            self._drawn = True
+        # 在震央位置新增標記 使用 HTML 和 CSS 建立帶有「X」符號的標記
+        folium.Marker(
+            location=[self._eq.lat, self._eq.lon],
+            popup="震央",
+            icon=folium.DivIcon(html='<div class="marker-icon";>&#10006;&#xfe0e;</div>')
+        ).add_to(m)
 
+        try:
+            html = m.get_root().render()
         except Exception as e:
+            self._error = e
             print(f"Error: {e}")
+            return
+
+        # 上傳端點只接受 form-urlencoded 參數 所以保留 str
+        self._image = io.StringIO(html)
+        self._drawn = True
+        # 釋放 folium 物件與渲染出的字串
+        del m, html
 
-    def upload(self, id):
+    async def upload(self, id, session: aiohttp.ClientSession):
         filename = id
         fileobj = self._image.getvalue()
 
@@ -172,7 +183,8 @@ class Map:
             "fileContent": fileobj,
         }
 
-        response = requests.post(url, data=data)
-
-        if not response.ok:
-            print(f"Error: {response.text}")
+        # 上傳的 HTML 有數 MB 不能沿用 session 上短的逾時設定
+        timeout = aiohttp.ClientTimeout(total=60)
+        async with session.post(url, data=data, timeout=timeout) as response:
+            if not response.ok:
+                print(f"Error: {await response.text()}")